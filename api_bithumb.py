@@ -1,29 +1,62 @@
 import os
-import jwt
+import hmac
+import orjson
 import uuid
 import time
+import base64
+import hashlib
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import pprint as pp
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 from dotenv import load_dotenv
 
+from api_common import create_session
+
+# 가격 정보를 제공하지 않아 잔고 조회에서 제외할 코인
+EXCLUDED_COINS = frozenset({'P', 'ETHW', 'ETHF'})
+
+def _b64url(data: bytes) -> bytes:
+    """JWT용 base64url 인코딩 (패딩 제거)"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
 class BithumbAPI:
     BASE_URL = "https://api.bithumb.com"
+    PRICE_CACHE_TTL = 10  # 일괄 시세 캐시 유지 시간(초)
+    TIMEOUT = 5  # 요청 타임아웃(초)
 
-    def __init__(self, access_token: str, secret_key: str):
+    def __init__(self, access_token: str, secret_key: str, session: Optional[requests.Session] = None):
         self.access_token = access_token
         self.secret_key = secret_key
+        # 빈 키로 서명하면 거래소에서 거절되는 토큰이 만들어지므로 미리 막는다
+        if not secret_key:
+            raise ValueError("Bithumb secret key is required")
+        # HS256 헤더는 고정값이므로 미리 인코딩해둔다
+        self._jwt_header_b64 = _b64url(b'{"alg":"HS256","typ":"JWT"}')
+        self._secret_bytes = secret_key.encode()
+        self._prices_cache: Dict[str, float] = {}
+        self._prices_expires_at = 0.0
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+
+    def close(self):
+        """HTTP 세션 종료 (직접 만든 세션만)"""
+        if self._owns_session:
+            self._session.close()
 
     def _get_jwt_token(self) -> str:
-        """JWT 토큰 생성"""
+        """JWT 토큰 생성 (요청마다 새 nonce/timestamp로 서명, 헤더와 키만 재사용)"""
         payload = {
             'access_key': self.access_token,
             'nonce': str(uuid.uuid4()),
             'timestamp': round(time.time() * 1000)
         }
-        jwt_token = jwt.encode(payload, self.secret_key)
+        payload_b64 = _b64url(orjson.dumps(payload))
+        signing_input = self._jwt_header_b64 + b'.' + payload_b64
+        signature = hmac.new(self._secret_bytes, signing_input, hashlib.sha256).digest()
+        jwt_token = (signing_input + b'.' + _b64url(signature)).decode()
         return f'Bearer {jwt_token}'
 
     def _request(self, method: str, endpoint: str, params: Dict = None) -> Dict:
@@ -33,13 +66,13 @@ class BithumbAPI:
             headers = {'Authorization': self._get_jwt_token()}
 
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params)
+                response = self._session.get(url, headers=headers, params=params, timeout=self.TIMEOUT)
             else:
-                response = requests.post(url, headers=headers, json=params)
+                response = self._session.post(url, headers=headers, json=params, timeout=self.TIMEOUT)
 
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"API Request Error: {e}")
             return []
 
@@ -65,15 +98,9 @@ class BithumbAPI:
         if currencies is None: # 별도 코인 목록이 없는 경우 -> 빗썸이 응답해주는 계좌잔고조회 구조형태 그대로 리턴해준다. (잔고가 있는 것만 리턴된다.)
             return accounts
 
-        result = []
-        for currency in currencies: # 요청받은 코인목록 파라미터가 있는 경우 -> 해당 코인이 회신받은 코인목록에 있는 경우는 그대로, 없는 경우에는 0으로 채워서 리턴해준다.
-            account = next((acc for acc in accounts if acc['currency'] == currency), None)
-            if account:
-                result.append(account)
-            else:
-                result.append({'currency': currency, 'balance': 0.0})
-        
-        return result
+        # 요청받은 코인목록 파라미터가 있는 경우 -> 해당 코인이 회신받은 코인목록에 있는 경우는 그대로, 없는 경우에는 0으로 채워서 리턴해준다.
+        index = {account['currency']: account for account in accounts}
+        return [index.get(currency, {'currency': currency, 'balance': 0.0}) for currency in currencies]
 
     def get_balance_by_currency(self, currency: str) -> Dict:
         """단일 화폐 잔액 조회"""
@@ -87,58 +114,68 @@ class BithumbAPI:
             }
 
     def get_nonzero_balances(self) -> List[Dict]:
-        """잔액이 있는 화폐만 조회, 특정 코인 목록에 넣으면 제외"""
-        EXCLUDED_COINS = ['P', 'ETHW', 'ETHF']
-        
+        """잔액이 있는 화폐만 조회, EXCLUDED_COINS에 있는 코인은 제외"""
         balances = self.get_balances()
+        currencies = np.array([balance['currency'] for balance in balances], dtype=str)
+        amounts = np.fromiter((float(balance['balance']) for balance in balances), dtype=np.float64, count=len(balances))
+
+        mask = (amounts > 0) & ~np.isin(np.char.upper(currencies), list(EXCLUDED_COINS))
         return [
-            balance for balance in balances 
-            if float(balance['balance']) > 0 and balance['currency'].upper() not in EXCLUDED_COINS
+            {'currency': currency, 'balance': amount}
+            for currency, amount in zip(currencies[mask].tolist(), amounts[mask].tolist())
         ]
 
-    def get_price_by_currency(self, coin: str) -> float:
-        """현재가 조회"""
+    def get_all_prices(self) -> Dict[str, float]:
+        """KRW 마켓 전체 현재가 일괄 조회 (PRICE_CACHE_TTL초 동안 캐시)"""
+        if time.time() < self._prices_expires_at:
+            return self._prices_cache
+
         try:
-            response = self._request('GET', f'/public/ticker/{coin}_KRW')
-            if isinstance(response, dict) and response.get('data'):
-                return float(response['data']['closing_price'])
-            return 0.0
+            response = self._request('GET', '/public/ticker/ALL_KRW')
+            if not (isinstance(response, dict) and response.get('data')):
+                return {}
+            prices = {
+                coin: float(ticker['closing_price'])
+                for coin, ticker in response['data'].items()
+                if isinstance(ticker, dict)  # 응답에 섞여있는 'date' 항목 제외
+            }
         except (ValueError, KeyError) as e:
-            print(f"Error getting price for {coin}: {e}")
-            return 0.0
+            print(f"Error getting all prices: {e}")
+            return {}
 
+        self._prices_cache = prices
+        self._prices_expires_at = time.time() + self.PRICE_CACHE_TTL
+        return prices
 
-    def get_report(self, currencies: List[str] = None) -> pd.DataFrame:
-        """보유 화폐 리포트 생성"""
-        accounts = self.get_balances(currencies)
+    def get_price_by_currency(self, coin: str) -> float:
+        """현재가 조회"""
+        return self.get_all_prices().get(coin, 0.0)
+
+
+    def get_report(self, currencies: List[str] = None, accounts: List[Dict] = None) -> pd.DataFrame:
+        """보유 화폐 리포트 생성 (이미 조회한 잔고가 있으면 accounts로 넘겨서 재조회 생략)"""
+        if accounts is None:
+            accounts = self.get_balances(currencies)
         if not accounts:
             return pd.DataFrame(columns=['currency', 'balance', 'price', 'total', 'date'])
             
-        report_data = []
-        for account in accounts:
-            currency = account['currency']
-            balance = float(account['balance'])
-            
-            if currency == 'KRW':
-                price = 1.0
-            else:
-                price = self.get_price_by_currency(currency)
-            
-            report_data.append({
-                'currency': currency,
-                'balance': balance,
-                'price': price,
-                'total': (balance) * price,
-                'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            
-        return pd.DataFrame(report_data)
+        prices = self.get_all_prices()
+        coins = [account['currency'] for account in accounts]
+        balance_arr = np.fromiter((float(account['balance']) for account in accounts), dtype=np.float64, count=len(accounts))
+        price_arr = np.fromiter((1.0 if coin == 'KRW' else prices.get(coin, 0.0) for coin in coins), dtype=np.float64, count=len(coins))
+
+        df = pd.DataFrame({
+            'currency': coins,
+            'balance': balance_arr,
+            'price': price_arr,
+            'total': balance_arr * price_arr,
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        return df.sort_values(by='total', ascending=False, ignore_index=True)
 
     def get_report_with_nonzero_balances(self) -> pd.DataFrame:
         """잔액이 있는 화폐에 대한 리포트 생성"""
-        nonzero_accounts = self.get_nonzero_balances()
-        nonzero_currencies = [account['currency'] for account in nonzero_accounts]
-        return self.get_report(nonzero_currencies)
+        return self.get_report(accounts=self.get_nonzero_balances())
     
 def usage_example():
     load_dotenv()
@@ -182,9 +219,8 @@ def usage_example():
         report_df = api.get_report(nonzero_currencies)
         
         if not report_df.empty:
-            df = report_df.sort_values(by="total", ascending=False).reset_index(drop=True)
-            print(df)
-            total_sum = df['total'].sum()
+            print(report_df)
+            total_sum = float(report_df['total'].to_numpy().sum())
             print(f"빗썸 합계: {total_sum:,.0f}(원)")
         else:
             print("No balance data available")
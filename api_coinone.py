@@ -9,26 +9,40 @@ f = api.get_report(['KRW', 'BTC', 'AI16Z']) // returns a DataFrame with the repo
 
 import os
 import hmac
-import json
+import orjson
 import uuid
 import base64
 import hashlib
 import requests
 import pprint as pp
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from api_common import create_session, map_concurrently
+
 class CoinoneAPI:
     BASE_URL = "https://api.coinone.co.kr/"
+    MAX_WORKERS = 8
+    TIMEOUT = 5  # seconds
 
-    def __init__(self, access_token, secret_key):
+    def __init__(self, access_token, secret_key, session=None):
         self.access_token = access_token
         self.secret_key = bytes(secret_key, 'utf-8')
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._owns_session:
+            self._session.close()
 
     def _get_encoded_payload(self, payload):
         payload['nonce'] = str(uuid.uuid4())
-        encoded_json = base64.b64encode(json.dumps(payload).encode('utf-8'))
+        encoded_json = base64.b64encode(orjson.dumps(payload))
         return encoded_json
 
     def _get_signature(self, encoded_payload):
@@ -43,8 +57,8 @@ class CoinoneAPI:
             'X-COINONE-PAYLOAD': encoded_payload,
             'X-COINONE-SIGNATURE': self._get_signature(encoded_payload),
         }
-        response = requests.post(url, headers=headers)
-        return response.json()
+        response = self._session.post(url, headers=headers, timeout=self.TIMEOUT)
+        return orjson.loads(response.content)
 
     def get_balances(self, currencies):
         response = self._post_request("/v2.1/account/balance", {
@@ -72,13 +86,16 @@ class CoinoneAPI:
         if response.get("result") != "success":
             return None
         
-        balance_data = next((balance for balance in response.get("balances", []) if balance["currency"] == currency), None)
-        if balance_data:
-            return {
-                "currency": balance_data["currency"],
-                "balance": float(balance_data["available"]) + float(balance_data["limit"])
-            }
-        return None
+        # Only one currency was requested, so the response holds at most one balance
+        balances = response.get("balances", [])
+        if not balances:
+            return None
+
+        balance_data = balances[0]
+        return {
+            "currency": balance_data["currency"],
+            "balance": float(balance_data["available"]) + float(balance_data["limit"])
+        }
     
     def get_nonzero_balances(self):
         response = self._post_request("/v2.1/account/balance/all", {
@@ -103,10 +120,10 @@ class CoinoneAPI:
 
         def _make_request(url: str):
             try:
-                response = requests.get(url)
+                response = self._session.get(url, timeout=self.TIMEOUT)
                 response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
+                return orjson.loads(response.content)
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
                 return f"Error: {str(e)}"
 
         url = f'https://api.coinone.co.kr/ticker/?currency={coin}'
@@ -119,71 +136,39 @@ class CoinoneAPI:
                 return f"Error: Invalid Coinone price data.."
         return f"Error: Invalid Coinone price data"
 
-    def get_report(self, currencies):
-        # Get balances for the requested currencies
-        balances = self.get_balances(currencies)
-        report_data = []
-
-        # Get price for each currency and calculate the total value
-        for balance in balances:
-            currency = balance["currency"]
-            balance_amount = balance["balance"]
-            price = self.get_price_by_currency(currency)
-
-            # Skip currencies with invalid price data
-            if isinstance(price, str) and "Error" in price:
-                continue
-
-            total_value = price * balance_amount
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # Append the data for the report
-            report_data.append({
-                "currency": currency,
-                "balance": balance_amount,
-                "price": price,
-                "total": total_value,
-                "date": current_time
-            })
+    def get_prices(self, currencies):
+        return map_concurrently(self._executor, self.get_price_by_currency, currencies)
 
-        # Create DataFrame and return
-        df = pd.DataFrame(report_data)
-        df = df.sort_values(by="total", ascending=False, ignore_index=True)
-        return df
-    
-    
-    def get_report_with_nonzero_balances(self):
-        # Get non-zero balances
-        nonzero_balances = self.get_nonzero_balances()
-        report_data = []
-
-        # Get price for each currency and calculate the total value
-        for balance in nonzero_balances:
-            currency = balance["currency"]
-            balance_amount = balance["balance"]
-            price = self.get_price_by_currency(currency)
-
-            # Skip currencies with invalid price data
-            if isinstance(price, str) and "Error" in price:
-                continue
-
-            total_value = price * balance_amount
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # Append the data for the report
-            report_data.append({
-                "currency": currency,
-                "balance": balance_amount,
-                "price": price,
-                "total": total_value,
-                "date": current_time
-            })
+    def _build_report(self, balances):
+        prices = self.get_prices([balance["currency"] for balance in balances])
+
+        # Skip currencies with invalid price data
+        balances = [balance for balance in balances if not isinstance(prices[balance["currency"]], str)]
+
+        # Build the report column-wise and calculate the total value in one pass
+        coins = [balance["currency"] for balance in balances]
+        balance_arr = np.fromiter((balance["balance"] for balance in balances), dtype=np.float64, count=len(balances))
+        price_arr = np.fromiter((prices[coin] for coin in coins), dtype=np.float64, count=len(coins))
 
         # Create DataFrame and return
-        df = pd.DataFrame(report_data)
+        df = pd.DataFrame({
+            "currency": coins,
+            "balance": balance_arr,
+            "price": price_arr,
+            "total": balance_arr * price_arr,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
         df = df.sort_values(by="total", ascending=False, ignore_index=True)
         return df
-    
+
+    def get_report(self, currencies=None, balances=None):
+        # Get balances for the requested currencies, unless the caller already has them
+        if balances is None:
+            balances = self.get_balances(currencies)
+        return self._build_report(balances)
+
+    def get_report_with_nonzero_balances(self):
+        return self._build_report(self.get_nonzero_balances())
 
 
 def usage_example():
@@ -216,9 +201,8 @@ def usage_example():
 
     pd.set_option('display.float_format', lambda x: '{:,.4f}'.format(x))
     report_df = api.get_report(nonezero_currencies)
-    df = report_df.sort_values(by="total", ascending=False)
-    print(df)
-    total_sum = df['total'].sum()
+    print(report_df)
+    total_sum = float(report_df['total'].to_numpy().sum())
     print(f"코인원 합계: {total_sum:,.0f}(원)")
 
 
@@ -0,0 +1,38 @@
+'''
+거래소 API 클라이언트가 같이 쓰는 HTTP 세션/동시 조회 헬퍼
+'''
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_session():
+    """
+    커넥션 풀을 유지하는 HTTP 세션 생성
+    각 API를 단독으로 쓸 때와 Aggregator가 공유 세션을 넘길 때 같은 풀/재시도 설정을 쓰도록 한곳에서 만든다.
+    재시도는 연결 실패에만 적용: 요청이 서버에 도달하지 않았으므로 재전송해도 안전하다.
+    읽기 타임아웃/응답 이후 재시도는 하지 않음 (같은 JWT nonce 재전송 방지, 호출당 최대 대기시간을 TIMEOUT 수준으로 유지)
+    세션을 넘겨받은 API는 그 세션을 닫지 않고, 만든 쪽에서 닫는다.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=0.2))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def is_upbit_market_not_found(response):
+    """업비트가 KRW 마켓이 없는 코인에 돌려주는 404 "Code not found" 응답인지 확인"""
+    if response.status_code != 404:
+        return False
+    try:
+        error = orjson.loads(response.content).get('error') or {}
+    except (orjson.JSONDecodeError, AttributeError):
+        return False
+    return error.get('message') == 'Code not found'
+
+def map_concurrently(executor, fn, keys):
+    """
+    키마다 fn(key)를 executor에서 동시에 실행해서 {key: 결과}로 반환
+    코인별 시세 조회처럼 요청 하나하나가 네트워크 대기시간이 대부분인 경우, 전체 시간이 가장 느린 요청 하나 수준이 된다.
+    """
+    return dict(zip(keys, executor.map(fn, keys)))
@@ -1,24 +1,42 @@
 import os
 import requests
 import json
+import orjson
 from dotenv import load_dotenv
 import pprint as pp
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import hmac
 import hashlib
 import time
 
+from api_common import create_session, map_concurrently
+
+# 제외할 코인 리스트 - 가격 정보 제공안함
+EXCLUDED_COINS = frozenset({'ethw', 'ethf'})
+
 class KorbitAPI:
     BASE_URL = "https://api.korbit.co.kr"
+    MAX_WORKERS = 8
+    TIMEOUT = 5  # 요청 타임아웃(초)
 
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, session=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.access_token = None
         self.token_expires_at = 0
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
         self._get_access_token()
 
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._owns_session:
+            self._session.close()
+
     def _get_access_token(self):
         if time.time() < self.token_expires_at:
             return
@@ -31,9 +49,9 @@ class KorbitAPI:
         }
         
         try:
-            response = requests.post(url, data=payload)
+            response = self._session.post(url, data=payload, timeout=self.TIMEOUT)
             response.raise_for_status()
-            token_data = response.json()
+            token_data = orjson.loads(response.content)
             self.access_token = token_data['access_token']
             self.token_expires_at = time.time() + token_data['expires_in'] - 60
         except Exception as e:
@@ -46,53 +64,61 @@ class KorbitAPI:
             'Authorization': f'Bearer {self.access_token}'
         }
 
-    def get_balances(self, currencies=None):
+    def _fetch_balances(self):
         endpoint = f"{self.BASE_URL}/v1/user/balances"
         try:
-            response = requests.get(endpoint, headers=self._get_headers())
+            response = self._session.get(endpoint, headers=self._get_headers(), timeout=self.TIMEOUT)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # Debug print to see the actual response structure
             # print("Debug - API Response:", json.dumps(data, indent=2))
             
-            if not data:
-                return {}
-                
-            balances = {}
-            for currency, balance in data.items():
-                if currencies and currency not in currencies:
-                    continue
-                # 응답 구조에 따라 키 이름을 동적으로 처리
-                available = float(balance.get('available', 0))
-                trade_in_use = float(balance.get('trade_in_use', 0))  # 'locked' 또는 다른 키일 수 있음
-                
-                balances[currency] = {
-                    'currency': currency,
-                    'balance': available + trade_in_use,
-                    'available': available,
-                    'locked': trade_in_use
-                }
-            return balances
-        except requests.exceptions.RequestException as e:
+            return data or {}
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"Error fetching balances: {e}")
             return {}
 
-    def get_balance_by_currency(self, currency):
-        balances = self.get_balances([currency])
-        return balances.get(currency)
-
-    def get_nonzero_balances(self):
-        # 제외할 코인 리스트 - 가격 정보 제공안함
-        EXCLUDED_COINS = ['ethw', 'ethf']
+    @staticmethod
+    def _parse_balance(currency, balance):
+        # 응답 구조에 따라 키 이름을 동적으로 처리
+        available = float(balance.get('available', 0))
+        trade_in_use = float(balance.get('trade_in_use', 0))  # 'locked' 또는 다른 키일 수 있음
         
-        balances = self.get_balances()
         return {
-            currency: data 
-            for currency, data in balances.items() 
-            if data['balance'] > 0 and currency.lower() not in EXCLUDED_COINS
+            'currency': currency,
+            'balance': available + trade_in_use,
+            'available': available,
+            'locked': trade_in_use
         }
 
+    def _get_balances_df(self, currencies=None):
+        # 응답({코인: {...}})을 한번에 DataFrame으로 바꿔서 컬럼 단위로 계산
+        df = pd.DataFrame.from_dict(self._fetch_balances(), orient='index')
+        df.index = df.index.astype(str)
+        if currencies:
+            df = df[df.index.isin(set(currencies))]
+
+        # 응답 구조에 따라 없는 키는 0으로 처리 ('trade_in_use'는 'locked' 또는 다른 키일 수 있음)
+        df = df.reindex(columns=['available', 'trade_in_use']).astype(float).fillna(0.0)
+        df = df.rename(columns={'trade_in_use': 'locked'})
+        df['balance'] = df['available'] + df['locked']
+        df['currency'] = df.index
+        return df[['currency', 'balance', 'available', 'locked']]
+
+    def get_balances(self, currencies=None):
+        return self._get_balances_df(currencies).to_dict(orient='index')
+
+    def get_balance_by_currency(self, currency):
+        # 코빗은 단일 코인 잔고 API가 없으므로 전체 응답에서 해당 코인만 변환
+        balance = self._fetch_balances().get(currency)
+        return self._parse_balance(currency, balance) if balance else None
+
+    def get_nonzero_balances(self):
+        df = self._get_balances_df()
+        df = df[(df['balance'] > 0) & ~df.index.str.lower().isin(EXCLUDED_COINS)]
+        return df.to_dict(orient='index')
+
     def get_price_by_currency(self, coin: str):
         if coin.upper() == 'KRW':
             return 1, datetime.now()
@@ -101,59 +127,48 @@ class KorbitAPI:
         params = {'currency_pair': f"{coin.lower()}_krw"}
         
         try:
-            response = requests.get(endpoint, params=params)
+            response = self._session.get(endpoint, params=params, timeout=self.TIMEOUT)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             timestamp = datetime.fromtimestamp(int(data['timestamp'])/1000)
             return float(data['last']), timestamp
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"Error fetching price for {coin}: {e}")
             return None, None
 
-    def get_report(self, currencies):
-            # 제외할 코인 리스트
-            EXCLUDED_COINS = ['ethw', 'ethf']
-            
-            report = []
-            balances = self.get_balances(currencies)
-            
-            for currency, balance_data in balances.items():
-                # 제외할 코인 스킵
-                if currency.lower() in EXCLUDED_COINS:
-                    continue
-                    
-                price, timestamp = self.get_price_by_currency(currency)
-                if price is not None:
-                    available = balance_data['available']
-                    locked = balance_data['locked']
-                    total = (available + locked) * price
-                    report.append({
-                        'currency': currency,
-                        'balance': available + locked,
-                        'price': price,
-                        'total': total,
-                        'date': timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    })
-            
-            df = pd.DataFrame(report)
-            if not df.empty:
-                columns = ['currency', 'balance', 'price', 'total', 'date']
-                df = df[columns].sort_values(by="total", ascending=False)
-                
-                pd.set_option('display.float_format', lambda x: f'{x:,.4f}')
-                df['price'] = df['price'].apply(lambda x: f'{x:,.4f}')
-                df['total'] = df['total'].apply(lambda x: f'{x:,.4f}')
-
-                # Remove formatting for calculation
-                df['total'] = df['total'].str.replace(',', '').astype(float)
-
+    def get_prices(self, currencies):
+        return map_concurrently(self._executor, self.get_price_by_currency, currencies)
+
+    def get_report(self, currencies=None, balances=None):
+            # 이미 조회한 잔고가 있으면 재조회 생략
+            if balances is None:
+                balances = self.get_balances(currencies)
+            balances = {
+                currency: balance_data
+                for currency, balance_data in balances.items()
+                if currency.lower() not in EXCLUDED_COINS  # 제외할 코인 스킵
+            }
+            prices = self.get_prices(list(balances.keys()))
+
+            # 시세 조회에 성공한 코인만 컬럼 단위로 모아서 한번에 계산
+            coins = [currency for currency in balances if prices[currency][0] is not None]
+            balance_arr = np.fromiter((balances[coin]['available'] + balances[coin]['locked'] for coin in coins), dtype=np.float64, count=len(coins))
+            price_arr = np.fromiter((prices[coin][0] for coin in coins), dtype=np.float64, count=len(coins))
+            now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            dates = [prices[coin][1].strftime('%Y-%m-%d %H:%M:%S') if prices[coin][1] else now_str for coin in coins]
+
+            df = pd.DataFrame({
+                'currency': coins,
+                'balance': balance_arr,
+                'price': price_arr,
+                'total': balance_arr * price_arr,
+                'date': dates
+            })
             df = df.sort_values(by="total", ascending=False, ignore_index=True)
             return df
     
     def get_report_with_nonzero_balances(self):
-        nonzero_balances = self.get_nonzero_balances()
-        nonzero_currencies = list(nonzero_balances.keys())
-        return self.get_report(nonzero_currencies)
+        return self.get_report(balances=self.get_nonzero_balances())
 
 def sample_usage():
     load_dotenv()
@@ -185,8 +200,9 @@ def sample_usage():
 
         report_df = api.get_report(nonzero_currencies)
         if not report_df.empty:
+            pd.set_option('display.float_format', lambda x: f'{x:,.4f}')
             print(report_df)
-            total_sum = report_df['total'].astype(float).sum()
+            total_sum = float(report_df['total'].to_numpy().sum())
             print(f"코빗 합계: {total_sum:,.2f} KRW")
         else:
             print("No assets found or error occurred while fetching data")
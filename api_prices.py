@@ -8,21 +8,52 @@ sample_usage: (원)
     print("argo", price.get_first_valid_price('argo'))
     print("notdefinedthing", price.get_first_valid_price('notdefined'))
 '''
-from typing import Union, Dict, Tuple
+from typing import Union, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
 
+from api_common import create_session, is_upbit_market_not_found, map_concurrently
+
 @dataclass
 class ExchangePrice:
     exchange: str
     price: float
     error: str = None
+    not_listed: bool = False  # the exchange answered that it has no such market
 
     @property
     def is_error(self) -> bool:
         return self.error is not None
 
+PRICE_CACHE_TTL = 10  # seconds
+COINGECKO_CACHE_TTL = 60  # Coingecko rate limits are much stricter
+NEGATIVE_CACHE_TTL = 300  # coins an exchange doesn't list stay unlisted for a while
+BITHUMB_INVALID_PARAMETER = "5500"  # Bithumb's status for a ticker it doesn't list
+
+def _cached_price(exchange: str, ttl: float = PRICE_CACHE_TTL):
+    """Serve a PriceAPI exchange getter from its price cache while the entry is fresh,
+    and skip the request entirely for coins the exchange recently reported as not listed.
+    Transport errors (timeouts, 429s, ...) are not cached so the next lookup retries."""
+    def decorator(get_price):
+        @functools.wraps(get_price)
+        def wrapper(self, coin: str) -> ExchangePrice:
+            cached = self._get_cached_price(exchange, coin)
+            if cached is not None:
+                return cached
+            result = get_price(self, coin)
+            self._store_price(coin, result, ttl)
+            return result
+        return wrapper
+    return decorator
+
 class PriceAPI:
+    TIMEOUT = 5  # seconds
+    MAX_WORKERS = 16  # shared by the per-symbol Bithumb/Coinone lookups in get_first_valid_prices
+
     def __init__(self):
         self.token_map = {
             "btc": "bitcoin",
@@ -40,15 +71,51 @@ class PriceAPI:
             "usdc": "usd-coin",
             "usdt": "tether",
         }
+        self._price_cache: Dict[Tuple[str, str], Tuple[float, float]] = {}  # (exchange, coin) -> (price, expires_at)
+        self._neg_cache: Dict[Tuple[str, str], float] = {}  # (exchange, coin) -> expires_at
+        self._best_cache: Dict[str, Tuple[Tuple[float, str], float]] = {}  # symbol -> ((price, exchange), expires_at)
+        self._sess = create_session()
+        # Kept for the lifetime of the instance so repeated lookups reuse warm threads
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._sess.close()
+
+    def clear_cache(self):
+        self._price_cache.clear()
+        self._neg_cache.clear()
+        self._best_cache.clear()
+
+    def _get_cached_price(self, exchange: str, coin: str) -> Optional[ExchangePrice]:
+        key = (exchange, coin.lower())
+        now = time.time()
+        hit = self._price_cache.get(key)
+        if hit and now < hit[1]:
+            return ExchangePrice(exchange, hit[0])
+        if self._neg_cache.get(key, 0) > now:
+            return ExchangePrice(exchange, 0.0, "Error: cached miss", not_listed=True)
+        return None
+
+    def _store_price(self, coin: str, result: ExchangePrice, ttl: float = PRICE_CACHE_TTL):
+        key = (result.exchange, coin.lower())
+        if not result.is_error and result.price > 0:
+            self._price_cache[key] = (result.price, time.time() + ttl)
+        elif result.not_listed:
+            self._neg_cache[key] = time.time() + NEGATIVE_CACHE_TTL
 
     def _make_request(self, url: str) -> Union[Dict, str]:
         try:
-            response = requests.get(url)
+            response = self._sess.get(url, timeout=self.TIMEOUT)
+            if is_upbit_market_not_found(response):
+                # A definitive "no such market" answer, not a transport error
+                return orjson.loads(response.content)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             return f"Error: {str(e)}"
 
+    @_cached_price("Upbit")
     def get_upbit_price(self, coin: str) -> ExchangePrice:
         if coin.lower() == 'krw':
             return ExchangePrice("Upbit", 1.0)
@@ -59,13 +126,61 @@ class PriceAPI:
         if isinstance(data, str):
             return ExchangePrice("Upbit", 0.0, data)
 
-        if data and len(data) > 0:
+        if isinstance(data, dict):  # 404 "Code not found"
+            return ExchangePrice("Upbit", 0.0, "Error: Market not found", not_listed=True)
+        if data:
             try:
                 return ExchangePrice("Upbit", float(data[0].get("trade_price", 0)))
             except (ValueError, TypeError):
                 return ExchangePrice("Upbit", 0.0, "Error: Invalid price data")
         return ExchangePrice("Upbit", 0.0, "Error: Empty response from API")
 
+    def get_upbit_prices_bulk(self, coins: List[str]) -> Dict[str, ExchangePrice]:
+        """Get Upbit prices for several coins with a single ticker request.
+
+        Coins already in the price cache (or recently reported as not listed) are
+        not requested again, and fresh results are cached like get_upbit_price's.
+        Upbit rejects the whole request if any market is unknown; in that case the
+        remaining coins are looked up individually (concurrently, on the shared
+        executor) so the unknown ones get cached as not listed and drop out of the
+        next batch. Don't call this from a task already running on that executor.
+        """
+        prices = {}
+        remaining = []
+        for coin in coins:
+            cached = ExchangePrice("Upbit", 1.0) if coin.lower() == 'krw' else self._get_cached_price("Upbit", coin)
+            if cached is not None:
+                prices[coin] = cached
+            elif coin not in remaining:
+                remaining.append(coin)
+        if not remaining:
+            return prices
+
+        markets = ",".join(f'KRW-{coin.upper()}' for coin in remaining)
+        data = self._make_request(f'https://api.upbit.com/v1/ticker?markets={markets}')
+
+        if isinstance(data, str):
+            prices.update({coin: ExchangePrice("Upbit", 0.0, data) for coin in remaining})
+            return prices
+        if not isinstance(data, list):
+            prices.update(map_concurrently(self._executor, self.get_upbit_price, remaining))
+            return prices
+
+        tickers = {ticker.get("market"): ticker for ticker in data}
+        for coin in remaining:
+            ticker = tickers.get(f'KRW-{coin.upper()}')
+            if ticker is None:
+                result = ExchangePrice("Upbit", 0.0, "Error: Empty response from API")
+            else:
+                try:
+                    result = ExchangePrice("Upbit", float(ticker.get("trade_price", 0)))
+                except (ValueError, TypeError):
+                    result = ExchangePrice("Upbit", 0.0, "Error: Invalid price data")
+            self._store_price(coin, result)
+            prices[coin] = result
+        return prices
+
+    @_cached_price("Bithumb")
     def get_bithumb_price(self, coin: str) -> ExchangePrice:
         if coin.lower() == 'krw':
             return ExchangePrice("Bithumb", 1.0)
@@ -81,8 +196,11 @@ class PriceAPI:
                 return ExchangePrice("Bithumb", float(data["data"].get("closing_price", 0)))
             except (ValueError, TypeError):
                 return ExchangePrice("Bithumb", 0.0, "Error: Invalid price data")
-        return ExchangePrice("Bithumb", 0.0, f"Error: API returned status {data.get('status')}")
+        status = data.get('status')
+        return ExchangePrice("Bithumb", 0.0, f"Error: API returned status {status}",
+                             not_listed=status == BITHUMB_INVALID_PARAMETER)
 
+    @_cached_price("Coinone")
     def get_coinone_price(self, coin: str) -> ExchangePrice:
         if coin.lower() == 'krw':
             return ExchangePrice("Coinone", 1.0)
@@ -101,37 +219,90 @@ class PriceAPI:
         return ExchangePrice("Coinone", 0.0, f"Error: API returned errorCode {data.get('errorCode')}")
 
     def get_coingecko_price(self, coin: str) -> ExchangePrice:
-        if coin.lower() == 'krw':
-            return ExchangePrice("Coingecko", 1.0)
+        return self.get_coingecko_prices_bulk([coin])[coin]
 
-        token_id = self.token_map.get(coin.lower(), coin.lower())
-        url = f'https://api.coingecko.com/api/v3/simple/price?ids={token_id}&vs_currencies=krw'
-        data = self._make_request(url)
+    def get_coingecko_prices_bulk(self, coins: List[str]) -> Dict[str, ExchangePrice]:
+        """Get Coingecko prices for several coins with a single simple/price request.
+
+        Coingecko's rate limit is the strictest, so coins are never priced with one
+        request each; cached coins (and unknown token ids) are not requested again.
+        """
+        prices = {}
+        remaining = {}  # coin -> token_id
+        for coin in coins:
+            cached = ExchangePrice("Coingecko", 1.0) if coin.lower() == 'krw' else self._get_cached_price("Coingecko", coin)
+            if cached is not None:
+                prices[coin] = cached
+            else:
+                remaining[coin] = self.token_map.get(coin.lower(), coin.lower())
+        if not remaining:
+            return prices
+
+        ids = ",".join(dict.fromkeys(remaining.values()))
+        data = self._make_request(f'https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=krw')
 
         if isinstance(data, str):
-            return ExchangePrice("Coingecko", 0.0, data)
+            prices.update({coin: ExchangePrice("Coingecko", 0.0, data) for coin in remaining})
+            return prices
+
+        for coin, token_id in remaining.items():
+            if token_id not in data:
+                result = ExchangePrice("Coingecko", 0.0, f"Error: Unknown token id {token_id}", not_listed=True)
+            else:
+                try:
+                    result = ExchangePrice("Coingecko", float(data[token_id].get('krw', 0)))
+                except (ValueError, TypeError, AttributeError):
+                    result = ExchangePrice("Coingecko", 0.0, f"Error: Unable to get price for {coin}")
+            self._store_price(coin, result, COINGECKO_CACHE_TTL)
+            prices[coin] = result
+        return prices
 
-        try:
-            price = data.get(token_id, {}).get('krw', 0)
-            return ExchangePrice("Coingecko", float(price))
-        except (ValueError, TypeError):
-            return ExchangePrice("Coingecko", 0.0, f"Error: Unable to get price for {coin}")
-        
     def get_first_valid_price(self, symbol: str) -> Tuple[float, str]:
         """Get the first valid price from exchanges in priority order"""
-        exchanges = [
-            (self.get_upbit_price, "Upbit"),
-            (self.get_bithumb_price, "Bithumb"),
-            (self.get_coinone_price, "Coinone"),
-            (self.get_coingecko_price, "Coingecko")
-        ]
-
-        for get_price, exchange_name in exchanges:
-            result = get_price(symbol)
+        return self.get_first_valid_prices([symbol])[symbol]
+
+    def get_first_valid_prices(self, symbols: List[str]) -> Dict[str, Tuple[float, str]]:
+        """Get the first valid price for each symbol, querying every symbol/exchange pair at once.
+        Coingecko is only asked, in one batched request, for symbols no exchange could price."""
+        # Upbit prices every pending symbol with one batched ticker request
+        exchanges = [self.get_bithumb_price, self.get_coinone_price]
+
+        best_prices = {}
+        pending = {}
+        for symbol in symbols:
+            hit = self._best_cache.get(symbol.lower())
+            if hit and time.time() < hit[1]:
+                best_prices[symbol] = hit[0]
+            elif symbol not in pending:
+                # Query all exchanges at once, then pick the first valid one by priority
+                pending[symbol] = [self._executor.submit(get_price, symbol) for get_price in exchanges]
+        if not pending:
+            return best_prices
+
+        # Run the Upbit batch on this thread so it never queues behind the per-exchange futures
+        upbit_prices = self.get_upbit_prices_bulk(list(pending))
+        unpriced = []
+        for symbol, futures in pending.items():
+            results = [upbit_prices[symbol]] + [future.result() for future in futures]
+            valid = next((result for result in results if not result.is_error and float(result.price) > 0), None)
+            if valid is None:
+                unpriced.append(symbol)
+            else:
+                self._set_best_price(symbol, valid, best_prices)
+
+        coingecko_prices = self.get_coingecko_prices_bulk(unpriced) if unpriced else {}
+        for symbol in unpriced:
+            result = coingecko_prices[symbol]
             if not result.is_error and float(result.price) > 0:
-                return float(result.price), exchange_name
+                self._set_best_price(symbol, result, best_prices)
+            else:
+                best_prices[symbol] = 0.0, "No valid price found"
+
+        return {symbol: best_prices[symbol] for symbol in symbols}
 
-        return 0.0, "No valid price found"
+    def _set_best_price(self, symbol: str, result: ExchangePrice, best_prices: Dict[str, Tuple[float, str]]):
+        best_prices[symbol] = float(result.price), result.exchange
+        self._best_cache[symbol.lower()] = (best_prices[symbol], time.time() + PRICE_CACHE_TTL)
 
 
 def sample_usage():
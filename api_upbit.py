@@ -9,115 +9,237 @@ f = api.get_report(['KRW', 'BTC', 'AI16Z']) // returns a DataFrame with the repo
 
 import os
 from dotenv import load_dotenv
+import orjson
 import requests
 import jwt
-import uuid
+import time
 import hashlib
+import functools
+import itertools
+import operator
 from urllib.parse import urlencode
 import pprint as pp
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from api_common import create_session, is_upbit_market_not_found, map_concurrently
+
+# 제외할 코인 리스트 - 가격 정보 제공안함
+EXCLUDED_COINS = frozenset({'ETHW', 'ETHF'})
+
+@functools.lru_cache(maxsize=256)
+def _cached_query_hash(items):
+    # items: 쿼리 순서를 그대로 유지한 (key, value) 튜플 - 서명은 실제 요청 쿼리 문자열과 같아야 함
+    return hashlib.sha512(urlencode(items).encode()).hexdigest()
+
+def _query_hash(query):
+    """쿼리 SHA512 해시, 같은 쿼리는 한번만 계산"""
+    if 'nonce' in query:  # 매번 달라지는 쿼리는 캐시해도 소용없음
+        return hashlib.sha512(urlencode(query).encode()).hexdigest()
+    try:
+        return _cached_query_hash(tuple(query.items()))
+    except TypeError:  # 리스트 값처럼 해시할 수 없는 값이 있는 경우
+        return hashlib.sha512(urlencode(query).encode()).hexdigest()
+
 class UpbitAPI:
     BASE_URL = "https://api.upbit.com/v1/"
+    TIMEOUT = 5  # 요청 타임아웃(초)
+    MAX_WORKERS = 8
+    BALANCE_CACHE_TTL = 5  # 단일 코인 잔고 조회용 캐시 유지 시간(초)
+    PRICE_CACHE_TTL = 10  # 시세 캐시 유지 시간(초)
+    UNLISTED_CACHE_TTL = 300  # KRW 마켓이 없는 코인은 한동안 다시 조회하지 않음(초)
 
-    def __init__(self, access_key, secret_key):
+    def __init__(self, access_key, secret_key, session=None):
         self.access_key = access_key
         self.secret_key = secret_key
+        # 서명 키와 JWT 인코더는 한번만 준비
+        self._secret = secret_key.encode() if isinstance(secret_key, str) else secret_key
+        self._jwt = jwt.PyJWT()
+        # nonce는 키별로 중복만 없으면 되므로 현재 시각(ns)부터 1씩 증가하는 카운터 사용
+        self._nonce = itertools.count(time.time_ns())
+        self._balances_cache = (None, 0.0)  # ({currency: balance}, expires_at)
+        self._price_cache = {}  # coin -> (price, timestamp, expires_at)
+        self._unlisted = {}  # KRW 마켓이 없는 coin -> expires_at
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _get_auth_token(self, query=None):
+        # 업비트는 요청마다 새 nonce를 요구하므로 토큰은 매번 새로 서명 (쿼리 해시만 재사용)
         payload = {
             'access_key': self.access_key,
-            'nonce': str(uuid.uuid4()),
+            'nonce': str(next(self._nonce)),
         }
-        
+
         if query:
-            query_string = urlencode(query).encode()
-            m = hashlib.sha512()
-            m.update(query_string)
-            query_hash = m.hexdigest()
-            payload['query_hash'] = query_hash
+            payload['query_hash'] = _query_hash(query)
             payload['query_hash_alg'] = 'SHA512'
 
-        jwt_token = jwt.encode(payload, self.secret_key)
+        jwt_token = self._jwt.encode(payload, self._secret, algorithm='HS256')
         if isinstance(jwt_token, bytes):
             jwt_token = jwt_token.decode('utf-8')
         return f'Bearer {jwt_token}'
 
-    def get_balances(self, currencies=None):
+    def _get_balances_df(self, currencies=None):
         endpoint = "accounts"
         headers = {'Authorization': self._get_auth_token()}
-        response = requests.get(self.BASE_URL + endpoint, headers=headers)
+        response = self._session.get(self.BASE_URL + endpoint, headers=headers, timeout=self.TIMEOUT)
         
         if response.status_code != 200:
             print(f"Error: {response.status_code}, {response.text}")
-            return []
+            return pd.DataFrame(columns=['currency', 'balance', 'locked'])
             
-        balances = response.json()
-        for balance in balances:
-            balance['balance'] = str(float(balance['balance']) + float(balance['locked']))
-        
-        if currencies:
-            return [balance for balance in balances if balance['currency'] in currencies]
-        return balances
+        df = pd.DataFrame(orjson.loads(response.content))
+        if df.empty:
+            return pd.DataFrame(columns=['currency', 'balance', 'locked'])
+
+        # 잔고 = 주문가능 + 주문중 묶여있는 수량 (숫자 그대로 유지)
+        df['balance'] = df['balance'].astype('float64') + df['locked'].astype('float64')
+        if currencies is not None:
+            df = df[df['currency'].isin(currencies)]
+        return df
+
+    def get_balances(self, currencies=None):
+        return self._get_balances_df(currencies).to_dict('records')
+
+    def _get_balance_map(self):
+        # 전체 잔고를 한번 조회해서 BALANCE_CACHE_TTL초 동안 코인별로 찾아 쓴다
+        balance_map, expires_at = self._balances_cache
+        if balance_map is not None and time.monotonic() < expires_at:
+            return balance_map
+
+        balance_map = {balance['currency']: balance for balance in self.get_balances()}
+        self._balances_cache = (balance_map, time.monotonic() + self.BALANCE_CACHE_TTL)
+        return balance_map
 
     def get_balance_by_currency(self, currency):
-        balances = self.get_balances([currency])
-        return balances[0] if balances else None
+        return self._get_balance_map().get(currency)
 
     def get_nonzero_balances(self):
-        # 제외할 코인 리스트 - 가격 정보 제공안함
-        EXCLUDED_COINS = ['ETHW', 'ETHF']
-        
-        balances = self.get_balances()
-        return [
-            balance for balance in balances 
-            if float(balance['balance']) > 0 and balance['currency'].upper() not in EXCLUDED_COINS
-        ]
+        df = self._get_balances_df()
+        # 업비트는 코인 심볼을 대문자로 반환하므로 대소문자 변환 없이 바로 비교
+        df = df[(df['balance'] > 0) & ~df['currency'].isin(EXCLUDED_COINS)]
+        return df.to_dict('records')
+
+
+    def _get_cached_price(self, coin):
+        # PRICE_CACHE_TTL초 안에 조회한 시세는 재사용
+        cached = self._price_cache.get(coin)
+        if cached and time.monotonic() < cached[2]:
+            return cached[0], cached[1]
+        return None
 
+    def _set_cached_price(self, coin, price, timestamp):
+        self._price_cache[coin] = (price, timestamp, time.monotonic() + self.PRICE_CACHE_TTL)
+
+    def _is_unlisted(self, coin):
+        return self._unlisted.get(coin, 0) > time.monotonic()
 
     def get_price_by_currency(self, coin: str):
         if coin == 'KRW':
             return 1, datetime.now()
-            
+
+        cached = self._get_cached_price(coin)
+        if cached:
+            return cached
+        if self._is_unlisted(coin):
+            return None, None
+
         endpoint = f"ticker?markets=KRW-{coin}"
         try:
-            response = requests.get(self.BASE_URL + endpoint)
+            response = self._session.get(self.BASE_URL + endpoint, timeout=self.TIMEOUT)
+            if is_upbit_market_not_found(response):
+                # 일괄 조회에서 빼기 위해 기억해둠
+                self._unlisted[coin] = time.monotonic() + self.UNLISTED_CACHE_TTL
+                return None, None
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             if data:
                 timestamp = datetime.fromtimestamp(data[0]['timestamp'] / 1000)
+                self._set_cached_price(coin, data[0]['trade_price'], timestamp)
                 return data[0]['trade_price'], timestamp
             return None, None
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"Error fetching price for {coin}: {e}")
             return None, None
 
-    def get_report(self, currencies):
+    def get_prices_bulk(self, coins):
+        # 업비트 ticker는 여러 마켓을 콤마로 묶어서 한번의 요청으로 조회 가능
+        prices = {coin: (1, datetime.now()) for coin in coins if coin == 'KRW'}
+        for coin in coins:
+            cached = coin != 'KRW' and self._get_cached_price(coin)
+            if cached:
+                prices[coin] = cached
+        # 캐시에 없고, KRW 마켓이 없다고 확인된 코인도 아닌 것만 요청
+        markets = ",".join(f"KRW-{coin}" for coin in coins if coin not in prices and not self._is_unlisted(coin))
+        if not markets:
+            return prices
+
+        endpoint = f"ticker?markets={markets}"
+        try:
+            response = self._session.get(self.BASE_URL + endpoint, timeout=self.TIMEOUT)
+            response.raise_for_status()
+            for ticker in orjson.loads(response.content):
+                coin = ticker['market'].split('-')[1]
+                prices[coin] = ticker['trade_price'], datetime.fromtimestamp(ticker['timestamp'] / 1000)
+                self._set_cached_price(coin, *prices[coin])
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            print(f"Error fetching prices for {markets}: {e}")
+        return prices
+
+    def get_prices(self, currencies):
+        return map_concurrently(self._executor, self.get_price_by_currency, currencies)
+
+    def get_report(self, currencies=None, balances=None):
         report = []
-        for currency in currencies:
-            balance = self.get_balance_by_currency(currency)
-            if balance:
-                price, timestamp = self.get_price_by_currency(currency)
-                if price is not None:
-                    total = float(balance['balance']) * price
-                    report.append({
-                        'currency': currency,
-                        'balance': float(balance['balance']),
-                        'price': price,
-                        'total': total,
-                        'date': timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                    })
+        # 잔고는 한번만 조회 (이미 조회한 잔고가 있으면 재조회 생략)
+        if balances is None:
+            balances = self.get_balances(currencies)
+        balances = {balance['currency']: balance for balance in balances}
+        prices = self.get_prices_bulk(list(balances.keys()))
+        # 업비트에 없는 마켓이 하나라도 섞여 있으면 일괄 조회 전체가 실패하므로, 빠진 코인만 개별 조회
+        missing = [currency for currency in balances if currency not in prices and not self._is_unlisted(currency)]
+        if missing:
+            prices.update(self.get_prices(missing))
 
+        for currency, balance in balances.items():
+            price, timestamp = prices.get(currency, (None, None))
+            if price is not None:
+                total = float(balance['balance']) * price
+                report.append({
+                    'currency': currency,
+                    'balance': float(balance['balance']),
+                    'price': price,
+                    'total': total,
+                    'date': timestamp
+                })
+
+        # 시세를 하나도 못 가져온 경우(거래소 장애 등) 정렬/변환 없이 빈 리포트 반환
+        if not report:
+            return pd.DataFrame(columns=['currency', 'balance', 'price', 'total', 'date'])
+
+        # 코인 수가 적어서 DataFrame 정렬보다 리스트 정렬이 빠름, DataFrame은 정렬된 결과로 한번만 생성
+        report.sort(key=operator.itemgetter('total'), reverse=True)
         df = pd.DataFrame(report)
-        df = df.sort_values(by="total", ascending=False, ignore_index=True)
+        # 행마다 strftime 하지 않고 date 컬럼 전체를 한번에 문자열로 변환
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
         return df
     
 
     def get_report_with_nonzero_balances(self):
-        nonzero_balances = self.get_nonzero_balances()
-        nonzero_currencies = [item['currency'] for item in nonzero_balances]
-        return self.get_report(nonzero_currencies)
+        return self.get_report(balances=self.get_nonzero_balances())
 
 
 def usage_example():
@@ -143,15 +265,11 @@ def usage_example():
 
         report_df = api.get_report(nonzero_currencies)
         if not report_df.empty:
-            # 컬럼 순서 지정
-            columns = ['currency', 'balance', 'price', 'total', 'date']
-            df = report_df[columns].sort_values(by="total", ascending=False)
-            
             # DataFrame 포맷팅
             pd.set_option('display.float_format', lambda x: '{:,.4f}'.format(x))
-            print(df)
+            print(report_df)
             
-            total_sum = df['total'].sum()
+            total_sum = float(report_df['total'].to_numpy().sum())
             print(f"업비트 합계: {total_sum:,.0f}(원)")
         else:
             print("No assets found or error occurred while fetching data")
@@ -3,49 +3,75 @@ import api_coinone as co
 import api_korbit as ko
 import api_upbit as up
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import pandas as pd
 
+from api_common import create_session
+
+def build_all_reports(exchanges, executor=None):
+    """
+    거래소별 잔고 리포트를 동시에 생성
+    exchanges: {거래소 이름: API 인스턴스} -> {거래소 이름: 리포트 DataFrame}
+    executor: 재사용할 ThreadPoolExecutor (없으면 이번 호출용으로 만들고 끝나면 종료)
+    거래소끼리는 서로 독립적이므로 전체 소요시간은 가장 느린 거래소 하나의 시간이 된다.
+    한 거래소에서 오류가 나도 나머지 거래소 리포트는 그대로 돌려준다.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(len(exchanges), 1)) as executor:
+            return build_all_reports(exchanges, executor)
+
+    reports = {}
+    futures = {executor.submit(api.get_report_with_nonzero_balances): name for name, api in exchanges.items()}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            reports[name] = future.result()
+        except Exception as e:
+            print(f"Error in {name} report: {str(e)}")
+
+    # 완료 순서와 관계없이 요청한 거래소 순서로 정렬
+    return {name: reports[name] for name in exchanges if name in reports}
+
 class Aggregator:
     def __init__(self, bithumb, coinone, korbit, upbit):
         self.bithumb = bithumb
         self.coinone = coinone
         self.korbit = korbit
-        self.upbit = upbit 
+        self.upbit = upbit
+        # 거래소별 리포트를 동시에 만드는 스레드풀, get_report를 반복 호출해도 재사용
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for api in (self.bithumb, self.coinone, self.korbit, self.upbit):
+            api.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_report(self):
-        dfs = []
-        
         try:
-            # 빗썸 리포트
-            bithumb_df = self.bithumb.get_report_with_nonzero_balances()
-            if not bithumb_df.empty:
-                bithumb_df['exchange'] = 'Bithumb'
-                dfs.append(bithumb_df)
-                
-            # 코인원 리포트
-            coinone_df = self.coinone.get_report_with_nonzero_balances()
-            if not coinone_df.empty:
-                coinone_df['exchange'] = 'Coinone'
-                dfs.append(coinone_df)
-                
-            # 코빗 리포트
-            korbit_df = self.korbit.get_report_with_nonzero_balances()
-            if not korbit_df.empty:
-                korbit_df['exchange'] = 'Korbit'
-                dfs.append(korbit_df)
-                
-            # 업비트 리포트
-            upbit_df = self.upbit.get_report_with_nonzero_balances()
-            if not upbit_df.empty:
-                upbit_df['exchange'] = 'Upbit'
-                dfs.append(upbit_df)
-            
-            # DataFrame 병합
+            # 빗썸, 코인원, 코빗, 업비트 리포트를 동시에 조회
+            reports = build_all_reports({
+                'Bithumb': self.bithumb,
+                'Coinone': self.coinone,
+                'Korbit': self.korbit,
+                'Upbit': self.upbit,
+            }, executor=self._executor)
+            # 거래소 이름을 붙여서 한번에 병합하고, 정렬하면서 인덱스도 같이 재생성
+            dfs = [df.assign(exchange=exchange) for exchange, df in reports.items() if not df.empty]
             if dfs:
-                result = pd.concat(dfs, ignore_index=True)
-                result = result.sort_values(by='total', ascending=False).reset_index(drop=True)
-                return result
+                if len(dfs) == 1:
+                    # 한 거래소뿐이면 병합/재정렬 생략 (거래소 리포트는 이미 total 기준 정렬됨)
+                    result = dfs[0]
+                else:
+                    result = pd.concat(dfs, ignore_index=True).sort_values(by='total', ascending=False, ignore_index=True)
+                # 반복되는 거래소/코인 이름은 category로 저장 (정수 코드라 메모리와 정렬/그룹핑에 유리)
+                return result.astype({'exchange': 'category', 'currency': 'category'})
             
             return pd.DataFrame()
             
@@ -66,27 +92,27 @@ def main():
     korbit_a = os.getenv("KORBIT_ACCESS_KEY")
     korbit_b = os.getenv("KORBIT_SECRET_KEY")
 
-    # API 인스턴스 생성
-    bithumb = bi.BithumbAPI(bithumb_a, bithumb_b)
-    coinone = co.CoinoneAPI(coinone_a, coinone_b)
-    korbit = ko.KorbitAPI(korbit_a, korbit_b)
-    upbit = up.UpbitAPI(upbit_a, upbit_b)
-    
+    # API 인스턴스 생성 (HTTP 세션은 모든 거래소가 공유)
+    session = create_session()
+    bithumb = bi.BithumbAPI(bithumb_a, bithumb_b, session=session)
+    coinone = co.CoinoneAPI(coinone_a, coinone_b, session=session)
+    korbit = ko.KorbitAPI(korbit_a, korbit_b, session=session)
+    upbit = up.UpbitAPI(upbit_a, upbit_b, session=session)
+
     # Aggregator 인스턴스 생성 및 리포트 출력
-    ag = Aggregator(bithumb, coinone, korbit, upbit)
-    
-    try:
-        report = ag.get_report()
-        if not report.empty:
-            pd.set_option('display.float_format', lambda x: '{:,.4f}'.format(x))
-            print("-"*30, sep="\n")
-            print(report)
-            total_sum = report['total'].sum()
-            print("-"*30, f"포트폴리오 합계: ₩{total_sum:,.0f}", "-"*30, sep="\n")
-        else:
-            print("No data available")
-    except Exception as e:
-        print(f"Error in main: {str(e)}")
+    with session, Aggregator(bithumb, coinone, korbit, upbit) as ag:
+        try:
+            report = ag.get_report()
+            if not report.empty:
+                pd.set_option('display.float_format', lambda x: '{:,.4f}'.format(x))
+                print("-"*30, sep="\n")
+                print(report)
+                total_sum = float(report['total'].to_numpy().sum())
+                print("-"*30, f"포트폴리오 합계: ₩{total_sum:,.0f}", "-"*30, sep="\n")
+            else:
+                print("No data available")
+        except Exception as e:
+            print(f"Error in main: {str(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
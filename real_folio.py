@@ -7,19 +7,36 @@ sample_usage:
 '''
 
 import os
-from typing import List
+import functools
+from typing import List, Tuple
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from datetime import datetime
 
 import api_prices as prices 
 
-@dataclass
+@dataclass(frozen=True)
 class CryptoHolding:
     symbol: str
     amount: float
 
+@functools.lru_cache(maxsize=1)
+def _load_holdings_from_env() -> Tuple[CryptoHolding, ...]:
+    """Parse CRYPTO_* holdings from the environment once per process"""
+    load_dotenv()
+
+    holdings = []
+    for key, value in os.environ.items():
+        if key.startswith('CRYPTO_'):
+            symbol = key.split('_')[1].lower()
+            try:
+                holdings.append(CryptoHolding(symbol, float(value)))
+            except ValueError:
+                print(f"Warning: Invalid amount for {symbol}: {value}")
+    return tuple(holdings)
+
 class PortfolioManager:
     def __init__(self):
         self.api = prices.PriceAPI()
@@ -34,64 +51,58 @@ class PortfolioManager:
         CRYPTO_SOL=123.852
         CRYPTO_AI16Z=65000.40
     '''
-    def load_holdings(self):
+    def load_holdings(self, refresh: bool = False):
         """Load holdings from .env file"""
-        load_dotenv()
-        
-        self.holdings = []
-        
-        for key, value in os.environ.items():
-            if key.startswith('CRYPTO_'):
-                symbol = key.split('_')[1].lower()
-                try:
-                    amount = float(value)
-                    self.holdings.append(CryptoHolding(symbol, amount))
-                except ValueError:
-                    print(f"Warning: Invalid amount for {symbol}: {value}")
+        # 한번 읽은 보유 코인 정보는 재사용, refresh=True면 .env/환경변수를 다시 읽음
+        if refresh:
+            _load_holdings_from_env.cache_clear()
+        self.holdings = list(_load_holdings_from_env())
 
     def calculate_portfolio(self) -> pd.DataFrame:
         """Calculate portfolio values and return as DataFrame"""
-        portfolio_data = []
-        total_value = 0.0
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+        # 보유 코인 시세를 한번에 동시 조회 (코인별 순차 조회 대신)
+        best_prices = self.api.get_first_valid_prices([holding.symbol for holding in self.holdings])
+
+        # 행(dict) 단위 대신 컬럼 단위로 모아서 DataFrame 생성
+        symbols, amounts, price_list, exchanges = [], [], [], []
         for holding in self.holdings:
-            price, exchange = self.api.get_first_valid_price(holding.symbol)
-            total_holding_value = price * holding.amount
-            total_value += total_holding_value
-
-            portfolio_data.append({
-                "date": current_time,
-                "symbol": holding.symbol.upper(),
-                "amount": holding.amount,
-                "price_krw": price,
-                "exchange": exchange,
-                "total_krw": total_holding_value
-            })
-
-        # Create DataFrame without total row
-        df = pd.DataFrame(portfolio_data)
+            price, exchange = best_prices[holding.symbol]
+            symbols.append(holding.symbol.upper())
+            amounts.append(holding.amount)
+            price_list.append(price)
+            exchanges.append(exchange)
+
+        amounts = np.array(amounts, dtype='float64')
+        price_list = np.array(price_list, dtype='float64')
+        totals = price_list * amounts
+        total_value = float(np.sum(totals))
+
+        df = pd.DataFrame({
+            "date": current_time,
+            "symbol": symbols,
+            "amount": amounts,
+            "price_krw": price_list,
+            "exchange": exchanges,
+            "total_krw": totals
+        }, columns=["date", "symbol", "amount", "price_krw", "exchange", "total_krw"])
 
         # 'Total Value (KRW)' 기준 내림차순 정렬 + 인덱스 초기화
-        df = df.sort_values(by="total_krw", ascending=False).reset_index(drop=True)
+        df = df.sort_values(by="total_krw", ascending=False, ignore_index=True)
 
         # Add total row after sorting
-        total_row = pd.DataFrame([{
+        df.loc[len(df)] = {
             "date": current_time,
             "symbol": "TOTAL",
-            "amount": pd.NA,
-            "price_krw": pd.NA,
+            "amount": np.nan,
+            "price_krw": np.nan,
             "exchange": pd.NA,
             "total_krw": total_value
-        }])
-
-        # Concatenate sorted data with total row
-        df = pd.concat([df, total_row], ignore_index=True)
-        
-        # Ensure correct column order
-        columns = ["date", "symbol", "amount", "price_krw", "exchange", "total_krw"]
-        df = df[columns]
-        
+        }
+        # TOTAL 행까지 추가한 뒤에 category로 변환 (변환 후에 새 값을 넣으면 category 추가가 필요)
+        df = df.astype({"symbol": "category", "exchange": "category"})
+
         return df
 
 def sample_usage():